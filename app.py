@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
+from plotly.colors import qualitative
 from plotly.subplots import make_subplots
+from plotly_resampler import FigureResampler
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import os
 import sqlite3
 from datetime import datetime, timedelta
@@ -23,140 +27,407 @@ st.markdown("An interactive dashboard for vehicle registration data from an inve
 if 'data_loaded' not in st.session_state:
     st.session_state.data_loaded = False
 
+# SQLite database written by process_data.py
+DB_PATH = 'vehicle_data.db'
+
+# Columns of vehicle_registrations used by the dashboard
+DASHBOARD_COLUMNS = ('date', 'category', 'manufacturer', 'registrations')
+
+# Seconds before SQLite results are read again, so a database rewritten by
+# process_data.py is picked up by a running dashboard
+SQL_CACHE_TTL = 600
+
+# Maximum number of rows shown in the raw data table
+RAW_DATA_MAX_ROWS = 10_000
+
+# Function to list the values of a filter column
+def filter_options(df, col):
+    """
+    Sorted distinct values of a column, or an empty list if the column is missing
+    """
+    if col not in df.columns:
+        return []
+    return sorted(df[col].dropna().unique().tolist())
+
+# Function to find the group columns with at most one row per date
+def daily_unique_groups(df):
+    """
+    Group columns whose (date, group) pairs are never repeated, so that summing
+    registrations per date and group would leave the data unchanged
+    """
+    if 'date' not in df.columns:
+        return ()
+    return tuple(
+        col for col in ('category', 'manufacturer')
+        if col in df.columns and not df.duplicated(['date', col]).any()
+    )
+
+# Function to read the dashboard columns of the registrations table and their dtypes
+def registrations_schema(conn):
+    """
+    Dashboard columns present in vehicle_registrations, and the explicit dtypes to read
+    them with (registrations as int64 when the column is declared INTEGER). Passing the
+    dtypes keeps an empty result numeric instead of object.
+    """
+    column_types = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(vehicle_registrations)')}
+    columns = [col for col in DASHBOARD_COLUMNS if col in column_types]
+    dtype = {'registrations': 'int64'} if column_types.get('registrations') == 'INTEGER' else None
+    return columns, dtype
+
 # Function to load data from SQLite database
-@st.cache_resource
-def load_data_from_sqlite(db_path='vehicle_data.db'):
+@st.cache_resource(ttl=SQL_CACHE_TTL)
+def load_data_from_sqlite(db_path=DB_PATH):
     """
-    Load data from SQLite database
+    Load the filter bounds and options and the growth tables from the SQLite database.
+    The registrations themselves are queried per filter selection by query_registrations,
+    so the returned frame only has the dashboard columns of the table and no rows; the
+    date range of the table is stored in its attrs.
     """
     if not os.path.exists(db_path):
         st.error("Database not found. Please run the data processing script first.")
-        return None
+        return None, None, None, None, None, None, None, None, None
     
     conn = sqlite3.connect(db_path)
     
-    # Load main data
-    df = pd.read_sql('SELECT * FROM vehicle_registrations', conn)
-    
-    # Convert date columns
+    # Look up the existing tables once instead of catching errors for missing ones
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    
+    if 'vehicle_registrations' not in tables:
+        conn.close()
+        st.error("No registrations table in the database. Please run the data processing script first.")
+        return None, None, None, None, None, None, None, None, None
+    
+    # An empty frame with the dashboard columns, read with the same dtypes as the queries
+    columns, dtype = registrations_schema(conn)
+    df = pd.read_sql(
+        f"SELECT {', '.join(columns)} FROM vehicle_registrations LIMIT 0",
+        conn,
+        parse_dates=['date'] if 'date' in columns else None,
+        dtype=dtype
+    )
+    for col in ('category', 'manufacturer'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    
+    # Date bounds for the date filter; MIN/MAX are answered from the date index
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
+        min_date, max_date = conn.execute('SELECT MIN(date), MAX(date) FROM vehicle_registrations').fetchone()
+        df.attrs['date_range'] = (pd.Timestamp(min_date), pd.Timestamp(max_date))
+    
+    # Filter options come from the whole table, not the current selection
+    def distinct_values(col):
+        if col not in df.columns:
+            return []
+        return [
+            value for (value,) in
+            conn.execute(f'SELECT DISTINCT {col} FROM vehicle_registrations WHERE {col} IS NOT NULL ORDER BY {col}')
+        ]
+    
+    categories = distinct_values('category')
+    manufacturers = distinct_values('manufacturer')
+    
+    # Record which groups are already aggregated per date, so trends can skip the groupby
+    df.attrs['daily_unique'] = tuple(
+        col for col in ('category', 'manufacturer')
+        if col in df.columns and 'date' in df.columns and conn.execute(
+            f'SELECT 1 FROM vehicle_registrations GROUP BY date, {col} HAVING COUNT(*) > 1 LIMIT 1'
+        ).fetchone() is None
+    )
     
     # Load growth metrics
-    try:
-        monthly_cat = pd.read_sql('SELECT * FROM monthly_category_growth', conn)
-        if 'year_month' in monthly_cat.columns:
-            monthly_cat['year_month'] = pd.to_datetime(monthly_cat['year_month'])
-    except:
-        monthly_cat = None
-    
-    try:
-        yearly_cat = pd.read_sql('SELECT * FROM yearly_category_growth', conn)
-    except:
-        yearly_cat = None
-    
-    try:
-        quarterly_cat = pd.read_sql('SELECT * FROM quarterly_category_growth', conn)
-    except:
-        quarterly_cat = None
-    
-    try:
-        monthly_man = pd.read_sql('SELECT * FROM monthly_manufacturer_growth', conn)
-        if 'year_month' in monthly_man.columns:
-            monthly_man['year_month'] = pd.to_datetime(monthly_man['year_month'])
-    except:
-        monthly_man = None
-    
-    try:
-        yearly_man = pd.read_sql('SELECT * FROM yearly_manufacturer_growth', conn)
-    except:
-        yearly_man = None
-    
-    try:
-        quarterly_man = pd.read_sql('SELECT * FROM quarterly_manufacturer_growth', conn)
-    except:
-        quarterly_man = None
+    def read_table(name):
+        if name not in tables:
+            return None
+        return pd.read_sql(f'SELECT * FROM {name}', conn, parse_dates=['year_month'])
+    
+    monthly_cat = read_table('monthly_category_growth')
+    yearly_cat = read_table('yearly_category_growth')
+    quarterly_cat = read_table('quarterly_category_growth')
+    monthly_man = read_table('monthly_manufacturer_growth')
+    yearly_man = read_table('yearly_manufacturer_growth')
+    quarterly_man = read_table('quarterly_manufacturer_growth')
     
     conn.close()
     
-    return df, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man
+    return df, categories, manufacturers, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man
 
-# Function to load data from CSV files
+# Function to load data from Parquet files
 @st.cache_resource
-def load_data_from_csv(processed_dir='processed_data'):
+def load_data_from_parquet(processed_dir='processed_data'):
     """
-    Load data from CSV files
+    Load data from Parquet files
     """
+    # Scan the directory once; the modification times come from the DirEntry stats
+    entries = [
+        (entry.name, entry.stat().st_mtime)
+        for entry in os.scandir(processed_dir)
+        if entry.is_file() and entry.name.endswith('.parquet')
+    ]
+    
+    def latest_file(prefix):
+        candidates = [(name, mtime) for name, mtime in entries if name.startswith(prefix)]
+        return max(candidates, key=lambda x: x[1])[0] if candidates else None
+    
+    def read_latest(prefix):
+        filename = latest_file(prefix)
+        if filename is None:
+            return None
+        return pd.read_parquet(os.path.join(processed_dir, filename), engine='pyarrow')
+    
     # Find the most recent cleaned data file
-    cleaned_files = [f for f in os.listdir(processed_dir) if f.startswith('cleaned_data_')]
-    if not cleaned_files:
+    df = read_latest('cleaned_data_')
+    if df is None:
         st.error("No processed data found. Please run the data processing script first.")
-        return None, None, None, None, None, None, None
-    
-    latest_cleaned = max(cleaned_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-    df = pd.read_csv(os.path.join(processed_dir, latest_cleaned))
+        return None, None, None, None, None, None, None, None, None
     
-    # Convert date column to datetime
+    # Parquet keeps the datetime and categorical dtypes written by process_data.py;
+    # sort by date so date ranges can be sliced
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'])
-    
-    # Find growth metrics files
-    monthly_cat_files = [f for f in os.listdir(processed_dir) if f.startswith('monthly_category_growth_')]
-    yearly_cat_files = [f for f in os.listdir(processed_dir) if f.startswith('yearly_category_growth_')]
-    quarterly_cat_files = [f for f in os.listdir(processed_dir) if f.startswith('quarterly_category_growth_')]
-    monthly_man_files = [f for f in os.listdir(processed_dir) if f.startswith('monthly_manufacturer_growth_')]
-    yearly_man_files = [f for f in os.listdir(processed_dir) if f.startswith('yearly_manufacturer_growth_')]
-    quarterly_man_files = [f for f in os.listdir(processed_dir) if f.startswith('quarterly_manufacturer_growth_')]
-    
-    # Load the most recent files
-    if monthly_cat_files:
-        latest_monthly_cat = max(monthly_cat_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-        monthly_cat = pd.read_csv(os.path.join(processed_dir, latest_monthly_cat))
-        if 'year_month' in monthly_cat.columns:
-            monthly_cat['year_month'] = pd.to_datetime(monthly_cat['year_month'])
-    else:
-        monthly_cat = None
+        df = df.sort_values('date', ignore_index=True)
+        df.attrs['date_range'] = (df['date'].min(), df['date'].max())
     
-    if yearly_cat_files:
-        latest_yearly_cat = max(yearly_cat_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-        yearly_cat = pd.read_csv(os.path.join(processed_dir, latest_yearly_cat))
-    else:
-        yearly_cat = None
+    # Load the most recent growth metrics files
+    monthly_cat = read_latest('monthly_category_growth_')
+    yearly_cat = read_latest('yearly_category_growth_')
+    quarterly_cat = read_latest('quarterly_category_growth_')
+    monthly_man = read_latest('monthly_manufacturer_growth_')
+    yearly_man = read_latest('yearly_manufacturer_growth_')
+    quarterly_man = read_latest('quarterly_manufacturer_growth_')
     
-    if quarterly_cat_files:
-        latest_quarterly_cat = max(quarterly_cat_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-        quarterly_cat = pd.read_csv(os.path.join(processed_dir, latest_quarterly_cat))
-    else:
-        quarterly_cat = None
+    # Record which groups are already aggregated per date, so trends can skip the groupby
+    df.attrs['daily_unique'] = daily_unique_groups(df)
     
-    if monthly_man_files:
-        latest_monthly_man = max(monthly_man_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-        monthly_man = pd.read_csv(os.path.join(processed_dir, latest_monthly_man))
-        if 'year_month' in monthly_man.columns:
-            monthly_man['year_month'] = pd.to_datetime(monthly_man['year_month'])
-    else:
-        monthly_man = None
+    # Filter options come from the whole dataset, not the current selection
+    categories = filter_options(df, 'category')
+    manufacturers = filter_options(df, 'manufacturer')
     
-    if yearly_man_files:
-        latest_yearly_man = max(yearly_man_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-        yearly_man = pd.read_csv(os.path.join(processed_dir, latest_yearly_man))
-    else:
-        yearly_man = None
+    return df, categories, manufacturers, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man
+
+# Function to query the registrations matching the filters from SQLite
+@st.cache_data(ttl=SQL_CACHE_TTL)
+def query_registrations(db_path, start_date=None, end_date=None, categories=None, manufacturers=None):
+    """
+    Read only the dashboard columns of the registrations matching the filters,
+    letting SQLite use its indexes instead of filtering the full table in pandas.
+    A filter that is None is not applied.
+    """
+    conn = sqlite3.connect(db_path)
     
-    if quarterly_man_files:
-        latest_quarterly_man = max(quarterly_man_files, key=lambda x: os.path.getmtime(os.path.join(processed_dir, x)))
-        quarterly_man = pd.read_csv(os.path.join(processed_dir, latest_quarterly_man))
-    else:
-        quarterly_man = None
+    columns, dtype = registrations_schema(conn)
+    table_columns = set(columns)
+    
+    query = f"SELECT {', '.join(columns)} FROM vehicle_registrations WHERE 1=1"
+    params = []
+    
+    if start_date is not None and end_date is not None and 'date' in table_columns:
+        # Dates are stored as ISO text, so compare against the day after end_date
+        query += " AND date >= ? AND date < ?"
+        params += [str(start_date), str(end_date + timedelta(days=1))]
+    
+    if categories is not None and 'category' in table_columns:
+        query += f" AND category IN ({','.join('?' * len(categories))})"
+        params += list(categories)
     
-    return df, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man
+    if manufacturers is not None and 'manufacturer' in table_columns:
+        query += f" AND manufacturer IN ({','.join('?' * len(manufacturers))})"
+        params += list(manufacturers)
+    
+    if 'date' in table_columns:
+        query += " ORDER BY date"
+    
+    df = pd.read_sql(query, conn, params=params, parse_dates=['date'] if 'date' in table_columns else None, dtype=dtype)
+    conn.close()
+    
+    # Store the grouping columns as categoricals
+    for col in ('category', 'manufacturer'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    
+    return df
 
-# Load data
-df, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man = load_data_from_sqlite()
+# Function to filter the registrations data
+def filter_df(source, start_date=None, end_date=None, categories=None, manufacturers=None):
+    """
+    Filter the registrations data by date range, categories and manufacturers.
+    A filter that is None is not applied. The source is either the path of the SQLite
+    database, in which case the filters are pushed into the (cached) query, or the
+    DataFrame from the Parquet loader, which is sorted by date so the date range is a
+    contiguous slice found with two binary searches.
+    """
+    if isinstance(source, str):
+        return query_registrations(source, start_date, end_date, categories, manufacturers)
+    
+    df_filtered = source
+    
+    if start_date is not None and end_date is not None and 'date' in df_filtered.columns:
+        date_vals = df_filtered['date'].values
+        lo = date_vals.searchsorted(np.datetime64(start_date))
+        hi = date_vals.searchsorted(np.datetime64(end_date) + np.timedelta64(1, 'D'))
+        df_filtered = df_filtered.iloc[lo:hi]
+    
+    if categories is not None and 'category' in df_filtered.columns:
+        df_filtered = df_filtered[df_filtered['category'].isin(categories)]
+    
+    if manufacturers is not None and 'manufacturer' in df_filtered.columns:
+        df_filtered = df_filtered[df_filtered['manufacturer'].isin(manufacturers)]
+    
+    return df_filtered
+
+# Function to aggregate registrations for the current filters
+@st.cache_data(ttl=SQL_CACHE_TTL, hash_funcs={pd.DataFrame: id})
+def compute_aggregates(source, filters, daily_unique=()):
+    """
+    Aggregate the filtered data for the key metrics, trend and market share sections.
+    Registrations are summed once per date and group; the market shares and the total
+    are marginals of those sums, so the filtered rows are scanned once per group column.
+    Group columns listed in daily_unique already have one row per date and group, so
+    their rows are used as the sums directly.
+    Returns the total and dicts of trend and share frames keyed by group column.
+    """
+    df_filtered = filter_df(source, *filters)
+    
+    total = None
+    trends = {}
+    shares = {}
+    
+    for group_col in ('category', 'manufacturer'):
+        if group_col not in df_filtered.columns:
+            continue
+        
+        keys = [col for col in ('date', group_col) if col in df_filtered.columns]
+        
+        if group_col in daily_unique and 'date' in keys:
+            by_date_group = df_filtered[keys + ['registrations']]
+        else:
+            # Keep missing keys so the marginals still count every row
+            by_date_group = df_filtered.groupby(keys, observed=True, dropna=False)['registrations'].sum().reset_index()
+        
+        if total is None:
+            total = by_date_group['registrations'].sum()
+        
+        if 'date' in keys:
+            trends[group_col] = by_date_group.dropna(subset=keys)
+        
+        share = by_date_group.groupby(group_col, observed=True)['registrations'].sum().reset_index()
+        share['share'] = (share['registrations'] / share['registrations'].sum()) * 100
+        shares[group_col] = share
+    
+    if total is None:
+        total = df_filtered['registrations'].sum()
+    
+    return total, trends, shares
+
+# Function to export the filtered data as CSV
+@st.cache_data(ttl=SQL_CACHE_TTL, hash_funcs={pd.DataFrame: id})
+def filtered_csv(source, filters):
+    """
+    Encode the filtered data as CSV for the download button with Arrow's C CSV writer.
+    Dates, when present, are written as plain days, since registrations are recorded per day.
+    """
+    table = pa.Table.from_pandas(filter_df(source, *filters), preserve_index=False)
+    date_idx = table.schema.get_field_index('date')
+    if date_idx >= 0:
+        table = table.set_column(date_idx, 'date', pc.cast(table['date'], pa.date32(), safe=False))
+    
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(table, sink)
+    return sink.getvalue().to_pybytes()
+
+# Function to get the latest period of a growth table
+@st.cache_data(ttl=SQL_CACHE_TTL)
+def latest_growth(growth_df, group_col, selected):
+    """
+    Filter a growth table to the selected groups and keep only the latest year
+    (and the latest quarter within it, for quarterly tables). The growth tables are
+    small and are reloaded with the database, so they are hashed by content.
+    """
+    filtered = growth_df[growth_df[group_col].isin(selected)]
+    
+    latest_year = filtered['year'].max()
+    latest = filtered[filtered['year'] == latest_year]
+    
+    latest_quarter = None
+    if 'quarter' in latest.columns:
+        latest_quarter = latest['quarter'].max()
+        latest = latest[latest['quarter'] == latest_quarter]
+    
+    return latest, latest_year, latest_quarter
+
+# Maximum number of points sent to the browser per trend line
+TREND_MAX_SAMPLES = 2000
+
+# Function to build a downsampled trend line chart
+def trend_figure(df_trend, group_col, title):
+    """
+    Build a line chart with one WebGL trace per group. Each trace is downsampled with
+    MinMaxLTTB (plotly-resampler's default) to at most TREND_MAX_SAMPLES points, so the
+    figure size stays bounded however long the date range is. The resampling markers
+    in trace names are turned off: they describe Dash's live resampling, which
+    Streamlit does not run, so the legend shows the plain group names.
+    """
+    fig = FigureResampler(
+        go.Figure(),
+        default_n_shown_samples=TREND_MAX_SAMPLES,
+        resampled_trace_prefix_suffix=('', ''),
+        show_mean_aggregation_size=False
+    )
+    
+    for group, df_group in df_trend.groupby(group_col, observed=True, sort=False):
+        fig.add_trace(
+            go.Scattergl(name=str(group), mode='lines'),
+            hf_x=df_group['date'].values,
+            hf_y=df_group['registrations'].values
+        )
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title='Date',
+        yaxis_title='Number of Registrations',
+        legend_title_text=group_col
+    )
+    
+    return fig
+
+# Function to build a bar chart of the latest growth values
+def growth_bar_figure(df_latest, group_col, value_col, title, value_label):
+    """
+    Build a bar chart with one coloured bar per group from the column arrays
+    """
+    groups = df_latest[group_col].to_numpy()
+    colors = [qualitative.Plotly[i % len(qualitative.Plotly)] for i in range(len(groups))]
+    
+    fig = go.Figure(go.Bar(
+        x=groups,
+        y=df_latest[value_col].to_numpy(),
+        marker_color=colors
+    ))
+    fig.update_layout(title=title, xaxis_title=group_col, yaxis_title=value_label)
+    
+    return fig
+
+# Function to build a market share pie chart
+def share_pie_figure(df_share, group_col, title):
+    """
+    Build a pie chart of the share column, with registrations shown on hover
+    """
+    fig = go.Figure(go.Pie(
+        labels=df_share[group_col].to_numpy(),
+        values=df_share['share'].to_numpy(),
+        customdata=df_share['registrations'].to_numpy(),
+        hovertemplate='%{label}<br>Market Share (%): %{value:.2f}<br>Registrations: %{customdata:,}<extra></extra>'
+    ))
+    fig.update_layout(title=title)
+    
+    return fig
+
+# Load data; filtering is pushed into SQLite when the database is available
+df, categories, manufacturers, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man = load_data_from_sqlite()
+source = DB_PATH
 
 if df is None:
-    # Try to load from CSV files
-    df, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man = load_data_from_csv()
+    # Try to load from Parquet files
+    df, categories, manufacturers, monthly_cat, yearly_cat, quarterly_cat, monthly_man, yearly_man, quarterly_man = load_data_from_parquet()
+    source = df
 
 if df is not None:
     st.session_state.data_loaded = True
@@ -166,8 +437,7 @@ if df is not None:
     
     # Date range filter
     if 'date' in df.columns:
-        min_date = df['date'].min().date()
-        max_date = df['date'].max().date()
+        min_date, max_date = (d.date() for d in df.attrs['date_range'])
         
         date_range = st.sidebar.date_input(
             "Select Date Range",
@@ -178,41 +448,43 @@ if df is not None:
         
         # Filter data based on date range
         start_date, end_date = date_range
-        mask = (df['date'].dt.date >= start_date) & (df['date'].dt.date <= end_date)
-        df_filtered = df.loc[mask].copy()
     else:
-        df_filtered = df.copy()
+        start_date, end_date = None, None
     
     # Vehicle category filter
-    if 'category' in df_filtered.columns:
-        categories = sorted(df_filtered['category'].unique())
+    selected_categories = None
+    if 'category' in df.columns:
         selected_categories = st.sidebar.multiselect(
             "Select Vehicle Categories",
             options=categories,
             default=categories
         )
-        
-        # Filter data based on selected categories
-        df_filtered = df_filtered[df_filtered['category'].isin(selected_categories)]
+        selected_categories = tuple(selected_categories)
     
     # Manufacturer filter
-    if 'manufacturer' in df_filtered.columns:
-        manufacturers = sorted(df_filtered['manufacturer'].unique())
+    selected_manufacturers = None
+    if 'manufacturer' in df.columns:
         selected_manufacturers = st.sidebar.multiselect(
             "Select Manufacturers",
             options=manufacturers,
             default=manufacturers[:5] if len(manufacturers) > 5 else manufacturers
         )
-        
-        # Filter data based on selected manufacturers
-        df_filtered = df_filtered[df_filtered['manufacturer'].isin(selected_manufacturers)]
+        selected_manufacturers = tuple(selected_manufacturers)
+    
+    # Filter data based on the date range and selections
+    df_filtered = filter_df(source, start_date, end_date, selected_categories, selected_manufacturers)
+    
+    # Filter values used as the cache key for the aggregations below
+    filters = (start_date, end_date, selected_categories, selected_manufacturers)
+    
+    if 'registrations' in df_filtered.columns:
+        total_registrations, trends, shares = compute_aggregates(source, filters, df.attrs.get('daily_unique', ()))
     
     # Display key metrics
     st.header("Key Metrics")
     
     # Calculate total registrations
     if 'registrations' in df_filtered.columns:
-        total_registrations = df_filtered['registrations'].sum()
         st.metric("Total Registrations", f"{total_registrations:,.0f}")
     
     # Display YoY and QoQ growth metrics
@@ -224,20 +496,16 @@ if df is not None:
         if yearly_cat is not None:
             # Filter YoY data based on selected categories
             if 'category' in yearly_cat.columns and selected_categories:
-                yoy_cat_filtered = yearly_cat[yearly_cat['category'].isin(selected_categories)]
-                
                 # Get the latest year
-                latest_year = yoy_cat_filtered['year'].max()
-                yoy_latest = yoy_cat_filtered[yoy_cat_filtered['year'] == latest_year]
+                yoy_latest, latest_year, _ = latest_growth(yearly_cat, 'category', selected_categories)
                 
                 # Create a bar chart
-                fig_yoy_cat = px.bar(
+                fig_yoy_cat = growth_bar_figure(
                     yoy_latest,
-                    x='category',
-                    y='yoy_growth',
+                    'category',
+                    'yoy_growth',
                     title=f"YoY Growth by Category ({latest_year})",
-                    labels={'yoy_growth': 'YoY Growth (%)'},
-                    color='category'
+                    value_label='YoY Growth (%)'
                 )
                 
                 st.plotly_chart(fig_yoy_cat, use_container_width=True)
@@ -245,20 +513,16 @@ if df is not None:
         if yearly_man is not None:
             # Filter YoY data based on selected manufacturers
             if 'manufacturer' in yearly_man.columns and selected_manufacturers:
-                yoy_man_filtered = yearly_man[yearly_man['manufacturer'].isin(selected_manufacturers)]
-                
                 # Get the latest year
-                latest_year = yoy_man_filtered['year'].max()
-                yoy_latest = yoy_man_filtered[yoy_man_filtered['year'] == latest_year]
+                yoy_latest, latest_year, _ = latest_growth(yearly_man, 'manufacturer', selected_manufacturers)
                 
                 # Create a bar chart
-                fig_yoy_man = px.bar(
+                fig_yoy_man = growth_bar_figure(
                     yoy_latest,
-                    x='manufacturer',
-                    y='yoy_growth',
+                    'manufacturer',
+                    'yoy_growth',
                     title=f"YoY Growth by Manufacturer ({latest_year})",
-                    labels={'yoy_growth': 'YoY Growth (%)'},
-                    color='manufacturer'
+                    value_label='YoY Growth (%)'
                 )
                 
                 st.plotly_chart(fig_yoy_man, use_container_width=True)
@@ -269,22 +533,16 @@ if df is not None:
         if quarterly_cat is not None:
             # Filter QoQ data based on selected categories
             if 'category' in quarterly_cat.columns and selected_categories:
-                qoq_cat_filtered = quarterly_cat[quarterly_cat['category'].isin(selected_categories)]
-                
                 # Get the latest year and quarter
-                latest_year = qoq_cat_filtered['year'].max()
-                latest_quarter = qoq_cat_filtered[qoq_cat_filtered['year'] == latest_year]['quarter'].max()
-                qoq_latest = qoq_cat_filtered[(qoq_cat_filtered['year'] == latest_year) & 
-                                             (qoq_cat_filtered['quarter'] == latest_quarter)]
+                qoq_latest, latest_year, latest_quarter = latest_growth(quarterly_cat, 'category', selected_categories)
                 
                 # Create a bar chart
-                fig_qoq_cat = px.bar(
+                fig_qoq_cat = growth_bar_figure(
                     qoq_latest,
-                    x='category',
-                    y='qoq_growth',
+                    'category',
+                    'qoq_growth',
                     title=f"QoQ Growth by Category (Q{latest_quarter} {latest_year})",
-                    labels={'qoq_growth': 'QoQ Growth (%)'},
-                    color='category'
+                    value_label='QoQ Growth (%)'
                 )
                 
                 st.plotly_chart(fig_qoq_cat, use_container_width=True)
@@ -292,22 +550,16 @@ if df is not None:
         if quarterly_man is not None:
             # Filter QoQ data based on selected manufacturers
             if 'manufacturer' in quarterly_man.columns and selected_manufacturers:
-                qoq_man_filtered = quarterly_man[quarterly_man['manufacturer'].isin(selected_manufacturers)]
-                
                 # Get the latest year and quarter
-                latest_year = qoq_man_filtered['year'].max()
-                latest_quarter = qoq_man_filtered[qoq_man_filtered['year'] == latest_year]['quarter'].max()
-                qoq_latest = qoq_man_filtered[(qoq_man_filtered['year'] == latest_year) & 
-                                             (qoq_man_filtered['quarter'] == latest_quarter)]
+                qoq_latest, latest_year, latest_quarter = latest_growth(quarterly_man, 'manufacturer', selected_manufacturers)
                 
                 # Create a bar chart
-                fig_qoq_man = px.bar(
+                fig_qoq_man = growth_bar_figure(
                     qoq_latest,
-                    x='manufacturer',
-                    y='qoq_growth',
+                    'manufacturer',
+                    'qoq_growth',
                     title=f"QoQ Growth by Manufacturer (Q{latest_quarter} {latest_year})",
-                    labels={'qoq_growth': 'QoQ Growth (%)'},
-                    color='manufacturer'
+                    value_label='QoQ Growth (%)'
                 )
                 
                 st.plotly_chart(fig_qoq_man, use_container_width=True)
@@ -318,33 +570,19 @@ if df is not None:
     if 'date' in df_filtered.columns and 'registrations' in df_filtered.columns:
         # Group by date and category
         if 'category' in df_filtered.columns:
-            df_category_trend = df_filtered.groupby(['date', 'category'])['registrations'].sum().reset_index()
+            df_category_trend = trends['category']
             
             # Create a line chart for category trends
-            fig_category_trend = px.line(
-                df_category_trend,
-                x='date',
-                y='registrations',
-                color='category',
-                title="Vehicle Registration Trends by Category",
-                labels={'registrations': 'Number of Registrations', 'date': 'Date'}
-            )
+            fig_category_trend = trend_figure(df_category_trend, 'category', "Vehicle Registration Trends by Category")
             
             st.plotly_chart(fig_category_trend, use_container_width=True)
         
         # Group by date and manufacturer
         if 'manufacturer' in df_filtered.columns:
-            df_manufacturer_trend = df_filtered.groupby(['date', 'manufacturer'])['registrations'].sum().reset_index()
+            df_manufacturer_trend = trends['manufacturer']
             
             # Create a line chart for manufacturer trends
-            fig_manufacturer_trend = px.line(
-                df_manufacturer_trend,
-                x='date',
-                y='registrations',
-                color='manufacturer',
-                title="Vehicle Registration Trends by Manufacturer",
-                labels={'registrations': 'Number of Registrations', 'date': 'Date'}
-            )
+            fig_manufacturer_trend = trend_figure(df_manufacturer_trend, 'manufacturer', "Vehicle Registration Trends by Manufacturer")
             
             st.plotly_chart(fig_manufacturer_trend, use_container_width=True)
     
@@ -356,17 +594,13 @@ if df is not None:
     with col1:
         if 'category' in df_filtered.columns and 'registrations' in df_filtered.columns:
             # Calculate market share by category
-            category_share = df_filtered.groupby('category')['registrations'].sum().reset_index()
-            category_share['share'] = (category_share['registrations'] / category_share['registrations'].sum()) * 100
+            category_share = shares['category']
             
             # Create a pie chart
-            fig_category_share = px.pie(
+            fig_category_share = share_pie_figure(
                 category_share,
-                values='share',
-                names='category',
-                title="Market Share by Category",
-                hover_data=['registrations'],
-                labels={'share': 'Market Share (%)'}
+                'category',
+                title="Market Share by Category"
             )
             
             st.plotly_chart(fig_category_share, use_container_width=True)
@@ -374,20 +608,18 @@ if df is not None:
     with col2:
         if 'manufacturer' in df_filtered.columns and 'registrations' in df_filtered.columns:
             # Calculate market share by manufacturer
-            manufacturer_share = df_filtered.groupby('manufacturer')['registrations'].sum().reset_index()
-            manufacturer_share['share'] = (manufacturer_share['registrations'] / manufacturer_share['registrations'].sum()) * 100
+            manufacturer_share = shares['manufacturer']
             
-            # Sort by share and take top 10
-            manufacturer_share = manufacturer_share.sort_values('share', ascending=False).head(10)
+            # Take the top 10 by share (an empty selection has nothing to rank, and
+            # nlargest rejects the untyped share column it can come back with)
+            if not manufacturer_share.empty:
+                manufacturer_share = manufacturer_share.nlargest(10, 'share')
             
             # Create a pie chart
-            fig_manufacturer_share = px.pie(
+            fig_manufacturer_share = share_pie_figure(
                 manufacturer_share,
-                values='share',
-                names='manufacturer',
-                title="Market Share by Manufacturer (Top 10)",
-                hover_data=['registrations'],
-                labels={'share': 'Market Share (%)'}
+                'manufacturer',
+                title="Market Share by Manufacturer (Top 10)"
             )
             
             st.plotly_chart(fig_manufacturer_share, use_container_width=True)
@@ -397,7 +629,19 @@ if df is not None:
     
     if st.checkbox("Show raw data"):
         st.subheader("Raw Data")
-        st.write(df_filtered)
+        
+        # Only the first rows are sent to the browser; the full selection is a download
+        if len(df_filtered) > RAW_DATA_MAX_ROWS:
+            st.caption(f"Showing the first {RAW_DATA_MAX_ROWS:,} of {len(df_filtered):,} rows")
+        
+        st.dataframe(df_filtered.head(RAW_DATA_MAX_ROWS), use_container_width=True, height=400)
+        
+        st.download_button(
+            "Download full data as CSV",
+            data=filtered_csv(source, filters),
+            file_name="vehicle_registrations.csv",
+            mime="text/csv"
+        )
     
     # Add a section for investor insights
     st.header("Investor Insights")
@@ -1,28 +1,101 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import sqlite3
 
+# Characters stripped from numeric columns before conversion. These are patterns for
+# Arrow's RE2 kernels rather than Python's re, so digits are spelled out as ASCII [0-9]
+NON_NUMERIC_PATTERN = r'[^0-9.]'
+
+# What is left of a valid number once the other characters are stripped
+STRIPPED_NUMBER_PATTERN = r'^([0-9]+\.?[0-9]*|\.[0-9]+)$'
+
+# Standard vehicle category names, keyed by the upper-cased raw name
+CATEGORY_NAMES = {
+    'TWO WHEELER': '2W',
+    'THREE WHEELER': '3W',
+    'FOUR WHEELER': '4W',
+    '2 WHEELER': '2W',
+    '3 WHEELER': '3W',
+    '4 WHEELER': '4W'
+}
+
+# Standard manufacturer names, keyed by the title-cased raw name
+MANUFACTURER_NAMES = {
+    'Hero': 'Hero MotoCorp',
+    'Bajaj': 'Bajaj Auto',
+    'Tata': 'Tata Motors',
+    'Mahindra': 'Mahindra & Mahindra',
+    'Mahindra And Mahindra': 'Mahindra & Mahindra'
+}
+
+def read_data_file(filepath):
+    """
+    Read a single CSV or Parquet file, returning the DataFrame and the error message if it failed
+    """
+    try:
+        if filepath.endswith('.parquet'):
+            return pd.read_parquet(filepath), None
+        return pd.read_csv(filepath), None
+    except Exception as e:
+        return None, str(e)
+
+def strip_to_numeric(series):
+    """
+    Convert a column of strings to numbers by removing every character other than
+    digits and '.', using Arrow compute kernels. Values that are not a number after
+    stripping become NaN, and the result is integer if every value is a whole number
+    that fits in int64.
+    """
+    values = pa.array(series.astype(str), type=pa.string())
+    stripped = pc.replace_substring_regex(values, pattern=NON_NUMERIC_PATTERN, replacement='')
+    
+    valid = pc.match_substring_regex(stripped, pattern=STRIPPED_NUMBER_PATTERN)
+    numbers = pc.if_else(valid, stripped, pa.scalar(None, pa.string()))
+    
+    if pc.all(valid).as_py() and not pc.any(pc.match_substring(stripped, '.')).as_py():
+        try:
+            numbers = pc.cast(numbers, pa.int64())
+        except pa.ArrowInvalid:
+            # Too large for int64, so fall back to float64 as pd.to_numeric does
+            numbers = pc.cast(numbers, pa.float64())
+    else:
+        numbers = pc.cast(numbers, pa.float64())
+    
+    return pd.Series(numbers.to_numpy(zero_copy_only=False), index=series.index, name=series.name)
+
 def load_data(data_dir='data'):
     """
-    Load all CSV files from the data directory and combine them into a single DataFrame
+    Load all CSV and Parquet files from the data directory and combine them into a single DataFrame
     """
-    all_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
+    all_files = [
+        entry.name for entry in os.scandir(data_dir)
+        if entry.is_file() and entry.name.endswith(('.csv', '.parquet'))
+    ]
     
     if not all_files:
         print("No data files found.")
         return None
     
+    # Parse the files in parallel worker processes when there is more than one
+    filepaths = [os.path.join(data_dir, filename) for filename in all_files]
+    if len(filepaths) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(filepaths), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(read_data_file, filepaths))
+    else:
+        results = [read_data_file(filepath) for filepath in filepaths]
+    
     dfs = []
-    for filename in all_files:
-        filepath = os.path.join(data_dir, filename)
-        try:
-            df = pd.read_csv(filepath)
+    for filename, (df, error) in zip(all_files, results):
+        if error is None:
             dfs.append(df)
             print(f"Loaded {filename}")
-        except Exception as e:
-            print(f"Error loading {filename}: {e}")
+        else:
+            print(f"Error loading {filename}: {error}")
     
     if not dfs:
         return None
@@ -36,8 +109,9 @@ def clean_data(df):
     """
     Clean the data by handling missing values, converting data types, etc.
     """
-    # Make a copy of the DataFrame to avoid SettingWithCopyWarning
-    df_clean = df.copy()
+    # Work on a shallow copy: the cleaning steps below only replace whole columns,
+    # so the caller's frame is left untouched without duplicating its data
+    df_clean = df.copy(deep=False)
     
     # Drop rows with all NA values
     df_clean.dropna(how='all', inplace=True)
@@ -58,69 +132,94 @@ def clean_data(df):
                    ['registration', 'value', 'number', 'count', 'sales'])]
     
     for col in numeric_cols:
+        # Columns read as numbers need no cleaning
+        if pd.api.types.is_numeric_dtype(df_clean[col]):
+            continue
+        
         try:
             # Remove any non-numeric characters
-            df_clean[col] = df_clean[col].astype(str).str.replace(r'[^\d.]', '', regex=True)
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
+            df_clean[col] = strip_to_numeric(df_clean[col])
         except:
             pass
     
-    # Standardize category names
+    # Standardize category names; the mapping is built over the distinct values
+    # only, so the string work does not scale with the number of rows
     if 'category' in df_clean.columns:
-        df_clean['category'] = df_clean['category'].str.upper()
-        df_clean['category'] = df_clean['category'].replace({
-            'TWO WHEELER': '2W',
-            'THREE WHEELER': '3W',
-            'FOUR WHEELER': '4W',
-            '2 WHEELER': '2W',
-            '3 WHEELER': '3W',
-            '4 WHEELER': '4W'
+        categories = df_clean['category'].astype('category')
+        df_clean['category'] = categories.map({
+            cat: CATEGORY_NAMES.get(cat.upper(), cat.upper()) if isinstance(cat, str) else np.nan
+            for cat in categories.cat.categories
         })
     
-    # Standardize manufacturer names
+    # Standardize manufacturer names the same way
     if 'manufacturer' in df_clean.columns:
-        df_clean['manufacturer'] = df_clean['manufacturer'].str.title()
-        df_clean['manufacturer'] = df_clean['manufacturer'].replace({
-            'Hero': 'Hero MotoCorp',
-            'Bajaj': 'Bajaj Auto',
-            'Tata': 'Tata Motors',
-            'Mahindra': 'Mahindra & Mahindra',
-            'Mahindra And Mahindra': 'Mahindra & Mahindra'
+        manufacturers = df_clean['manufacturer'].astype('category')
+        df_clean['manufacturer'] = manufacturers.map({
+            man: MANUFACTURER_NAMES.get(man.title(), man.title()) if isinstance(man, str) else np.nan
+            for man in manufacturers.cat.categories
         })
     
+    # Store the grouping columns as categoricals, with the standardized names sorted:
+    # the mapping keeps the order of the raw names, and observed=True groupbys order
+    # their rows by category code
+    for col in ('category', 'manufacturer'):
+        if col in df_clean.columns:
+            values = df_clean[col].astype('category')
+            df_clean[col] = values.cat.reorder_categories(sorted(values.cat.categories))
+    
     return df_clean
 
-def calculate_growth_metrics(df, date_col='date', value_col='registrations', group_col='category'):
+def pct_change_by_group(df, group_cols, order_col, value_col):
     """
-    Calculate YoY and QoQ growth metrics
+    Percentage change of value_col from the previous row of the same group, with the
+    rows of each group ordered by order_col. This is the same as
+    groupby(group_cols)[value_col].pct_change() * 100 on time-ordered groups, but is
+    computed in one numpy pass over the sorted arrays.
     """
-    # Make a copy of the DataFrame to avoid SettingWithCopyWarning
-    df_result = df.copy()
+    ordered = df.sort_values(group_cols + [order_col], kind='stable')
+    values = ordered[value_col].to_numpy(dtype=float)
+    
+    # A row continues its group if every group column matches the previous row
+    same_group = np.ones(max(len(ordered) - 1, 0), dtype=bool)
+    for col in group_cols:
+        keys = ordered[col].to_numpy()
+        same_group &= keys[1:] == keys[:-1]
     
-    # Extract year and quarter from the date column
-    df_result['year'] = df_result[date_col].dt.year
-    df_result['quarter'] = df_result[date_col].dt.quarter
-    df_result['month'] = df_result[date_col].dt.month
-    df_result['year_month'] = df_result[date_col].dt.to_period('M')
+    previous = np.full(len(values), np.nan)
+    previous[1:] = np.where(same_group, values[:-1], np.nan)
     
-    # Group by year and month and the specified group column
-    monthly = df_result.groupby(['year_month', group_col])[value_col].sum().reset_index()
-    monthly['year_month'] = monthly['year_month'].dt.to_timestamp()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (values / previous - 1) * 100
+    
+    return pd.Series(growth, index=ordered.index).reindex(df.index)
+
+def calculate_growth_metrics(df, date_col='date', value_col='registrations', group_col='category'):
+    """
+    Calculate YoY and QoQ growth metrics
+    """
+    # Group by month and the specified group column; the quarterly and yearly
+    # sums are derived from this much smaller frame instead of the raw rows
+    monthly = df.groupby([pd.Grouper(key=date_col, freq='MS'), group_col], observed=True)[value_col].sum().reset_index()
+    monthly = monthly.rename(columns={date_col: 'year_month'})
     
     # Calculate month-over-month growth
-    monthly['mom_growth'] = monthly.groupby(group_col)[value_col].pct_change() * 100
+    monthly['mom_growth'] = pct_change_by_group(monthly, [group_col], 'year_month', value_col)
+    
+    # Extract year and quarter from the monthly dates
+    year = monthly['year_month'].dt.year.rename('year')
+    quarter = monthly['year_month'].dt.quarter.rename('quarter')
     
     # Group by year and the specified group column
-    yearly = df_result.groupby(['year', group_col])[value_col].sum().reset_index()
+    yearly = monthly.groupby([year, group_col], observed=True)[value_col].sum().reset_index()
     
     # Calculate YoY growth
-    yearly['yoy_growth'] = yearly.groupby(group_col)[value_col].pct_change() * 100
+    yearly['yoy_growth'] = pct_change_by_group(yearly, [group_col], 'year', value_col)
     
     # Group by year, quarter, and the specified group column
-    quarterly = df_result.groupby(['year', 'quarter', group_col])[value_col].sum().reset_index()
+    quarterly = monthly.groupby([year, quarter, group_col], observed=True)[value_col].sum().reset_index()
     
     # Calculate QoQ growth
-    quarterly['qoq_growth'] = quarterly.groupby([group_col, 'year'])[value_col].pct_change() * 100
+    quarterly['qoq_growth'] = pct_change_by_group(quarterly, [group_col, 'year'], 'quarter', value_col)
     
     return monthly, yearly, quarterly
 
@@ -130,9 +229,20 @@ def save_to_sqlite(df, db_path='vehicle_data.db'):
     """
     conn = sqlite3.connect(db_path)
     
+    # Use WAL with relaxed syncing and a larger page cache for the bulk writes
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-65536')
+    
     # Save the main data
     df.to_sql('vehicle_registrations', conn, if_exists='replace', index=False)
     
+    # Index the filter columns (to_sql with if_exists='replace' drops old indexes)
+    for col in ('date', 'category', 'manufacturer'):
+        if col in df.columns:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS ix_reg_{col} ON vehicle_registrations({col})')
+    
     # Calculate and save growth metrics
     if 'category' in df.columns:
         monthly_cat, yearly_cat, quarterly_cat = calculate_growth_metrics(df, group_col='category')
@@ -140,6 +250,9 @@ def save_to_sqlite(df, db_path='vehicle_data.db'):
         monthly_cat.to_sql('monthly_category_growth', conn, if_exists='replace', index=False)
         yearly_cat.to_sql('yearly_category_growth', conn, if_exists='replace', index=False)
         quarterly_cat.to_sql('quarterly_category_growth', conn, if_exists='replace', index=False)
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_yearly_cat_year ON yearly_category_growth(year)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_quarterly_cat_year_quarter ON quarterly_category_growth(year, quarter)')
     
     if 'manufacturer' in df.columns:
         monthly_man, yearly_man, quarterly_man = calculate_growth_metrics(df, group_col='manufacturer')
@@ -147,7 +260,11 @@ def save_to_sqlite(df, db_path='vehicle_data.db'):
         monthly_man.to_sql('monthly_manufacturer_growth', conn, if_exists='replace', index=False)
         yearly_man.to_sql('yearly_manufacturer_growth', conn, if_exists='replace', index=False)
         quarterly_man.to_sql('quarterly_manufacturer_growth', conn, if_exists='replace', index=False)
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_yearly_man_year ON yearly_manufacturer_growth(year)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_quarterly_man_year_quarter ON quarterly_manufacturer_growth(year, quarter)')
     
+    conn.commit()
     conn.close()
     print(f"Data saved to SQLite database: {db_path}")
 
@@ -170,8 +287,8 @@ def process_data(data_dir='data', output_dir='processed_data'):
     
     # Save the cleaned data
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    df_clean.to_csv(f'{output_dir}/cleaned_data_{timestamp}.csv', index=False)
-    print(f"Saved cleaned data to {output_dir}/cleaned_data_{timestamp}.csv")
+    df_clean.to_parquet(f'{output_dir}/cleaned_data_{timestamp}.parquet', compression='zstd', index=False)
+    print(f"Saved cleaned data to {output_dir}/cleaned_data_{timestamp}.parquet")
     
     # Save to SQLite database
     save_to_sqlite(df_clean)
@@ -181,9 +298,9 @@ def process_data(data_dir='data', output_dir='processed_data'):
         monthly_cat, yearly_cat, quarterly_cat = calculate_growth_metrics(df_clean, group_col='category')
         
         # Save the results
-        monthly_cat.to_csv(f'{output_dir}/monthly_category_growth_{timestamp}.csv', index=False)
-        yearly_cat.to_csv(f'{output_dir}/yearly_category_growth_{timestamp}.csv', index=False)
-        quarterly_cat.to_csv(f'{output_dir}/quarterly_category_growth_{timestamp}.csv', index=False)
+        monthly_cat.to_parquet(f'{output_dir}/monthly_category_growth_{timestamp}.parquet', compression='zstd', index=False)
+        yearly_cat.to_parquet(f'{output_dir}/yearly_category_growth_{timestamp}.parquet', compression='zstd', index=False)
+        quarterly_cat.to_parquet(f'{output_dir}/quarterly_category_growth_{timestamp}.parquet', compression='zstd', index=False)
         
         print(f"Saved category growth metrics to {output_dir}/")
     
@@ -192,9 +309,9 @@ def process_data(data_dir='data', output_dir='processed_data'):
         monthly_man, yearly_man, quarterly_man = calculate_growth_metrics(df_clean, group_col='manufacturer')
         
         # Save the results
-        monthly_man.to_csv(f'{output_dir}/monthly_manufacturer_growth_{timestamp}.csv', index=False)
-        yearly_man.to_csv(f'{output_dir}/yearly_manufacturer_growth_{timestamp}.csv', index=False)
-        quarterly_man.to_csv(f'{output_dir}/quarterly_manufacturer_growth_{timestamp}.csv', index=False)
+        monthly_man.to_parquet(f'{output_dir}/monthly_manufacturer_growth_{timestamp}.parquet', compression='zstd', index=False)
+        yearly_man.to_parquet(f'{output_dir}/yearly_manufacturer_growth_{timestamp}.parquet', compression='zstd', index=False)
+        quarterly_man.to_parquet(f'{output_dir}/quarterly_manufacturer_growth_{timestamp}.parquet', compression='zstd', index=False)
         
         print(f"Saved manufacturer growth metrics to {output_dir}/")
     
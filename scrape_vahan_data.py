@@ -1,103 +1,343 @@
+import asyncio
+import aiohttp
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
 import pandas as pd
+import pyarrow as pa
 import numpy as np
 import time
 import os
+import io
+import re
+import gzip
+import shutil
+import hashlib
+from pathlib import Path
 from datetime import datetime
 import json
 
+# orjson decodes response bytes straight to Python objects; the standard library is the fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Browser User-Agent sent with every request
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Brotli is only advertised when its decoder is installed; requests and aiohttp
+# both decode br responses through the brotli package
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'br, gzip, deflate'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# Connect and read timeouts (seconds) for every request
+REQUEST_TIMEOUT = (5, 30)
+
+# Bytes read from the socket per parser feed when streaming the dashboard page
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of concurrent API requests
+API_CONCURRENCY = 5
+
+# URL for Vahan Dashboard - this may need to be updated
+DASHBOARD_URL = "https://vahan.parivahan.gov.in/vahan4dashboard/vahan/view/reportview.xhtml"
+
+# Example API endpoints (these are hypothetical and need to be replaced with actual endpoints)
+API_ENDPOINTS = [
+    "https://vahan.parivahan.gov.in/vahan4dashboard/api/vehicleCategory",
+    "https://vahan.parivahan.gov.in/vahan4dashboard/api/manufacturerData"
+]
+
+# Start of a vehicleData / chartData assignment in a script; the JSON literal itself
+# is read with JSON_DECODER.raw_decode so nested objects and arrays are parsed exactly
+JSON_ASSIGN_RE = re.compile(r'(?:vehicleData|chartData)\s*[:=]\s*(?=[\[{])')
+JSON_DECODER = json.JSONDecoder()
+
+# Scripts shorter than this (bootstrap snippets, event handlers) cannot hold useful data
+MIN_SCRIPT_LENGTH = 64
+
+# Precompiled XPath evaluators for table extraction; TEXT_NODES gathers an element's
+# text, including nested tags but not inline <script>/<style>/<template> code, in
+# libxml2 rather than in Python
+TABLE_HEADERS = etree.XPath('.//th')
+TABLE_ROWS = etree.XPath('.//tr')
+ROW_CELLS = etree.XPath('.//td')
+TEXT_NODES = etree.XPath('.//text()[not(ancestor::script or ancestor::style or ancestor::template)]')
+IN_TABLE = etree.XPath('boolean(ancestor::table)')
+
+# Seed for the generated sample data, so every run produces the same dataset
+SAMPLE_DATA_SEED = 42
+
+# Timestamp shared by every file written in this run
+RUN_TS = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+# Gzip-compressed copies of fetched pages, and how long (seconds) a copy is used
+# before the page is requested again
+PAGE_CACHE_DIR = 'data/.cache'
+PAGE_CACHE_TTL = 3600
+
+# Create the output and cache directories once, at import
+os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+
+# Validators (ETag / Last-Modified) and output files of the last response per URL
+VALIDATORS_PATH = 'data/.etags.json'
+
+# One session for every request so the TCP+TLS connection to the Vahan host is reused
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
+def load_validators():
+    """
+    Load the cached response validators, keyed by URL
+    """
+    try:
+        with open(VALIDATORS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_validators(validators):
+    """
+    Persist the response validators for the next run
+    """
+    with open(VALIDATORS_PATH, 'w') as f:
+        json.dump(validators, f, indent=2)
+
+def previous_outputs(validators, url):
+    """
+    Return the files saved from the previous response for a URL, or None unless
+    every one of them still exists
+    """
+    entry = validators.get(url)
+    if not entry or not entry['outputs'] or not all(os.path.exists(path) for path in entry['outputs']):
+        return None
+    return entry['outputs']
+
+def conditional_headers(validators, url):
+    """
+    Build If-None-Match / If-Modified-Since headers for a URL. Nothing is sent
+    unless every file saved from the previous response still exists, since a
+    304 Not Modified answer means reusing those files.
+    """
+    if not previous_outputs(validators, url):
+        return {}
+    
+    entry = validators[url]
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def remember_response(validators, url, response_headers, outputs):
+    """
+    Record the validators of a response and the files saved from it
+    """
+    validators[url] = {
+        'etag': response_headers.get('ETag'),
+        'last_modified': response_headers.get('Last-Modified'),
+        'outputs': outputs
+    }
+
+def json_to_dataframe(data):
+    """
+    Convert a decoded JSON payload to a DataFrame. A list of records is converted by
+    Arrow, which infers the columns (the union of the records' keys) and their types in
+    C++; an object is flattened one level deep. Returns None for any other payload.
+    """
+    if isinstance(data, dict):
+        return pd.json_normalize(data, max_level=1)
+    if not isinstance(data, list):
+        return None
+    
+    try:
+        # Read as one struct array so the schema covers every record, not just the first
+        return pa.Table.from_struct_array(pa.array(data)).to_pandas(types_mapper=pd.ArrowDtype)
+    except (pa.ArrowException, TypeError, AttributeError):
+        # Not a list of uniformly typed records
+        return pd.DataFrame(data)
+
+def cached_page_path(url):
+    """
+    Path of the cached copy of a page, named by a hash of its URL
+    """
+    digest = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+    return os.path.join(PAGE_CACHE_DIR, f'{digest}.html.gz')
+
+def fresh_cached_page(url):
+    """
+    Return the path of the cached copy of a page if it was saved less than
+    PAGE_CACHE_TTL seconds ago, otherwise None
+    """
+    path = cached_page_path(url)
+    try:
+        if time.time() - os.path.getmtime(path) < PAGE_CACHE_TTL:
+            return path
+    except OSError:
+        pass
+    return None
+
+def touch_cached_page(url):
+    """
+    Restart the TTL of the cached copy of a page that the server reported unchanged
+    """
+    try:
+        os.utime(cached_page_path(url))
+    except OSError:
+        pass
+
+def store_cached_page(url, stream):
+    """
+    Copy a response body into the page cache and return its path. Level 1 gzip keeps
+    the write cheap, and the copy goes to a temporary file first so an interrupted
+    download never leaves a truncated page behind.
+    """
+    path = cached_page_path(url)
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=1) as f:
+        shutil.copyfileobj(stream, f, STREAM_CHUNK_SIZE)
+    os.replace(tmp_path, path)
+    return path
+
 def scrape_vahan_dashboard():
     """
     Function to scrape data from Vahan Dashboard
     Note: Since Vahan Dashboard may require authentication or have dynamic content,
     this is a template that might need adjustments based on actual website structure.
+    The page is parsed as a stream: <script> and <table> elements are handled as soon
+    as they are complete and then freed (elements inside a table once the outermost
+    table is complete), so the full DOM is never held in memory.
     """
-    # Create directories if they don't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    base_url = DASHBOARD_URL
     
-    # URL for Vahan Dashboard - this may need to be updated
-    base_url = "https://vahan.parivahan.gov.in/vahan4dashboard/vahan/view/reportview.xhtml"
-    
-    # Headers to mimic browser request
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    validators = load_validators()
     
     try:
-        # Create a session to maintain cookies
-        session = requests.Session()
-        response = session.get(base_url, headers=headers)
-        response.raise_for_status()
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # A copy of the page saved less than PAGE_CACHE_TTL ago is used without any request
+        page_path = fresh_cached_page(base_url)
+        if page_path is not None:
+            outputs = previous_outputs(validators, base_url)
+            if outputs:
+                print(f"Dashboard page cached, reusing {', '.join(outputs)}")
+                return True
+            
+            print(f"Parsing the cached dashboard page {page_path}")
+            entry = validators.get(base_url, {})
+            response_headers = {'ETag': entry.get('etag'), 'Last-Modified': entry.get('last_modified')}
+        else:
+            # The shared session keeps cookies and the pooled connection
+            with SESSION.get(
+                base_url,
+                headers=conditional_headers(validators, base_url),
+                timeout=REQUEST_TIMEOUT,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                # Unchanged since the last run: the files saved then are still current
+                if response.status_code == 304:
+                    print(f"Dashboard unchanged since the last run, reusing {', '.join(validators[base_url]['outputs'])}")
+                    touch_cached_page(base_url)
+                    return True
+                
+                # Copy the body from the socket into the page cache in STREAM_CHUNK_SIZE reads;
+                # auto_close is turned off so the buffered reader sees a clean EOF instead of a closed file
+                response.raw.decode_content = True
+                response.raw.auto_close = False
+                page_path = store_cached_page(base_url, io.BufferedReader(response.raw, buffer_size=STREAM_CHUNK_SIZE))
+                response_headers = response.headers
         
         # If the site uses JavaScript to load data, we might need to look for API endpoints
         # For now, let's try to find data in script tags or tables
-        scripts = soup.find_all('script')
         data_found = False
+        saved_files = []
+        tables = []
+        table_slots = {}
         
-        # Look for JSON data in script tags
-        for script in scripts:
-            if 'vehicleData' in script.text or 'chartData' in script.text:
-                try:
-                    # Extract JSON data (this is a generic approach)
-                    json_text = script.text
-                    start_idx = json_text.find('{')
-                    end_idx = json_text.rfind('}') + 1
-                    
-                    if start_idx != -1 and end_idx != -1:
-                        json_data = json.loads(json_text[start_idx:end_idx])
-                        
-                        # Convert to DataFrame
-                        if isinstance(json_data, dict):
-                            df = pd.json_normalize(json_data)
-                        elif isinstance(json_data, list):
-                            df = pd.DataFrame(json_data)
-                        else:
+        # The parser is fed as the cached copy is decompressed
+        with gzip.open(page_path, 'rb') as stream:
+            for event, elem in etree.iterparse(stream, events=('start', 'end'), tag=('script', 'table'), html=True):
+                if event == 'start':
+                    # Reserve each table's place in document order, since a nested table
+                    # ends (and is extracted) before the table around it
+                    if elem.tag == 'table':
+                        table_slots[elem] = len(tables)
+                        tables.append(None)
+                    continue
+                
+                if elem.tag == 'script':
+                    # Look for JSON data in script tags, skipping the tiny ones unscanned
+                    script_text = elem.text or ''
+                    matches = JSON_ASSIGN_RE.finditer(script_text) if len(script_text) >= MIN_SCRIPT_LENGTH else ()
+                    for match in matches:
+                        try:
+                            # Decode just the literal assigned to the variable
+                            json_data, _ = JSON_DECODER.raw_decode(script_text, match.end())
+                        except ValueError:
                             continue
                         
-                        # Save the data
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        df.to_csv(f'data/vahan_data_{timestamp}.csv', index=False)
-                        print(f"Saved data to data/vahan_data_{timestamp}.csv")
-                        data_found = True
+                        try:
+                            # Convert to DataFrame (the literal is always an object or an array)
+                            df = json_to_dataframe(json_data)
+                            
+                            # Save the data, numbered so several scripts in one run don't collide
+                            path = f'data/vahan_data_{len(saved_files)}_{RUN_TS}.parquet'
+                            df.to_parquet(path, engine='pyarrow', compression='snappy', index=False)
+                            print(f"Saved data to {path}")
+                            saved_files.append(path)
+                            data_found = True
+                            break
                         
-                except Exception as e:
-                    print(f"Error parsing JSON data: {e}")
+                        except Exception as e:
+                            print(f"Error parsing JSON data: {e}")
+                
+                elif not data_found:
+                    # Keep the table contents in case no JSON data turns up
+                    headers = [''.join(TEXT_NODES(th)).strip() for th in TABLE_HEADERS(elem)]
+                    rows = [
+                        [''.join(TEXT_NODES(td)).strip() for td in ROW_CELLS(tr)]
+                        for tr in TABLE_ROWS(elem)[1:]  # Skip the header row
+                    ]
+                    tables[table_slots.pop(elem)] = (headers, rows)
+                
+                # Free the finished element and everything parsed before it. The tail is
+                # kept, as it is text of the parent, and nothing inside a table is freed
+                # until the outermost table ends, since that table's cells are read then
+                if not IN_TABLE(elem):
+                    elem.clear(keep_tail=True)
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
         
         # If no JSON data found, try to extract from tables
         if not data_found:
-            tables = soup.find_all('table')
-            
-            for i, table in enumerate(tables):
-                # Extract table headers
-                headers = []
-                for th in table.find_all('th'):
-                    headers.append(th.text.strip())
-                
-                # Extract table rows
-                rows = []
-                for tr in table.find_all('tr')[1:]:  # Skip the header row
-                    cells = tr.find_all('td')
-                    row = [cell.text.strip() for cell in cells]
-                    rows.append(row)
-                
+            for i, (headers, rows) in enumerate(tables):
                 if rows:
                     # Create a DataFrame
                     df = pd.DataFrame(rows, columns=headers)
                     
-                    # Save the DataFrame to a CSV file
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    df.to_csv(f'data/vahan_table_{i}_{timestamp}.csv', index=False)
-                    print(f"Saved table {i} to data/vahan_table_{i}_{timestamp}.csv")
+                    # Save the DataFrame to a Parquet file
+                    df.to_parquet(f'data/vahan_table_{i}_{RUN_TS}.parquet', engine='pyarrow', compression='snappy', index=False)
+                    print(f"Saved table {i} to data/vahan_table_{i}_{RUN_TS}.parquet")
+                    saved_files.append(f'data/vahan_table_{i}_{RUN_TS}.parquet')
                     data_found = True
         
         if not data_found:
             print("No data could be extracted. The website might use JavaScript to load data dynamically.")
             print("Consider using Selenium or checking for API endpoints.")
+        else:
+            remember_response(validators, base_url, response_headers, saved_files)
+            save_validators(validators)
         
         return data_found
     
@@ -105,64 +345,94 @@ def scrape_vahan_dashboard():
         print(f"Error scraping data: {e}")
         return False
 
+async def fetch_api_endpoint(session, semaphore, endpoint, headers):
+    """
+    Fetch one API endpoint and decode its JSON payload, holding the semaphore for
+    the whole request and body read.
+    Returns the response headers and the payload, which is None for 304 Not Modified.
+    """
+    async with semaphore:
+        async with session.get(endpoint, headers=headers) as response:
+            response.raise_for_status()
+            if response.status == 304:
+                return response.headers, None
+            return response.headers, json_loads(await response.read())
+
 # Alternative approach using API endpoints if available
-def get_vahan_api_data():
+async def get_vahan_api_data():
     """
     Attempt to get data from Vahan API endpoints if available
     This is a template function and will need to be adapted based on actual API structure
+    The endpoints are fetched concurrently, at most API_CONCURRENCY at a time
     """
-    # Create directories if they don't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
-    
-    # Example API endpoints (these are hypothetical and need to be replaced with actual endpoints)
-    api_endpoints = [
-        "https://vahan.parivahan.gov.in/vahan4dashboard/api/vehicleCategory",
-        "https://vahan.parivahan.gov.in/vahan4dashboard/api/manufacturerData"
-    ]
-    
     headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'User-Agent': USER_AGENT,
         'Accept': 'application/json',
+        'Accept-Encoding': ACCEPT_ENCODING,
         'Content-Type': 'application/json'
     }
+    timeout = aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT[0], sock_read=REQUEST_TIMEOUT[1])
+    connector = aiohttp.TCPConnector(limit=API_CONCURRENCY)
+    
+    # Bounds the requests in flight, instead of sleeping between them
+    semaphore = asyncio.Semaphore(API_CONCURRENCY)
     
-    for endpoint in api_endpoints:
+    validators = load_validators()
+    
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        results = await asyncio.gather(
+            *(
+                fetch_api_endpoint(session, semaphore, endpoint, conditional_headers(validators, endpoint))
+                for endpoint in API_ENDPOINTS
+            ),
+            return_exceptions=True
+        )
+    
+    for endpoint, result in zip(API_ENDPOINTS, results):
+        if isinstance(result, Exception):
+            print(f"Error getting data from {endpoint}: {result}")
+            continue
+        
+        response_headers, data = result
+        
+        # Unchanged since the last run: the file saved then is still current
+        if data is None:
+            print(f"{endpoint} unchanged since the last run, reusing {', '.join(validators[endpoint]['outputs'])}")
+            continue
+        
         try:
-            response = requests.get(endpoint, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            
             # Convert to DataFrame
-            if isinstance(data, dict):
-                df = pd.json_normalize(data)
-            elif isinstance(data, list):
-                df = pd.DataFrame(data)
-            else:
+            df = json_to_dataframe(data)
+            if df is None:
                 continue
             
-            # Save the data
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Save the data without blocking the event loop
             endpoint_name = endpoint.split('/')[-1]
-            df.to_csv(f'data/vahan_{endpoint_name}_{timestamp}.csv', index=False)
-            print(f"Saved API data to data/vahan_{endpoint_name}_{timestamp}.csv")
+            await asyncio.to_thread(
+                df.to_parquet, f'data/vahan_{endpoint_name}_{RUN_TS}.parquet',
+                engine='pyarrow', compression='snappy', index=False
+            )
+            print(f"Saved API data to data/vahan_{endpoint_name}_{RUN_TS}.parquet")
+            remember_response(validators, endpoint, response_headers, [f'data/vahan_{endpoint_name}_{RUN_TS}.parquet'])
             
         except Exception as e:
             print(f"Error getting data from {endpoint}: {e}")
+    
+    save_validators(validators)
 
 def generate_sample_data():
     """
     Generate sample data for testing purposes if scraping doesn't work
+    All rows are computed with NumPy arrays, one block of columns per category
     """
-    # Create directories if they don't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    # One seeded generator for every random draw below
+    rng = np.random.default_rng(SAMPLE_DATA_SEED)
     
     # Define date range
     start_date = '2021-01-01'
     end_date = '2023-12-31'
-    dates = pd.date_range(start=start_date, end=end_date, freq='M')
+    dates = pd.date_range(start=start_date, end=end_date, freq=pd.offsets.MonthEnd())
+    months = dates.month.to_numpy()
     
     # Define vehicle categories
     categories = ['2W', '3W', '4W']
@@ -174,56 +444,53 @@ def generate_sample_data():
         'Kia', 'MG Motor', 'Renault', 'Nissan', 'Volkswagen'
     ]
     
-    # Generate sample data
-    data = []
-    for date in dates:
-        for category in categories:
-            # Base number varies by category and has some seasonality
-            if category == '2W':
-                base = 500000 + 100000 * (date.month % 12) / 12
-            elif category == '3W':
-                base = 50000 + 10000 * (date.month % 12) / 12
-            else:  # 4W
-                base = 300000 + 50000 * (date.month % 12) / 12
-            
-            # Add some random variation
-            registrations = int(base * (0.8 + 0.4 * np.random.random()))
-            
-            # Add a row for the category total
-            data.append({
-                'Date': date,
-                'Category': category,
-                'Manufacturer': 'All',
-                'Registrations': registrations
-            })
-            
-            # Distribute registrations among manufacturers
-            if category == '2W':
-                relevant_manufacturers = manufacturers[:5]
-            elif category == '3W':
-                relevant_manufacturers = manufacturers[5:7]
-            else:  # 4W
-                relevant_manufacturers = manufacturers[5:]
-            
-            # Generate manufacturer-specific data
-            man_shares = np.random.dirichlet(np.ones(len(relevant_manufacturers)), size=1)[0]
-            
-            for i, manufacturer in enumerate(relevant_manufacturers):
-                man_registrations = int(registrations * man_shares[i])
-                data.append({
-                    'Date': date,
-                    'Category': category,
-                    'Manufacturer': manufacturer,
-                    'Registrations': man_registrations
-                })
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
+    # Manufacturers that registrations are distributed among, per category
+    category_manufacturers = {
+        '2W': manufacturers[:5],
+        '3W': manufacturers[5:7],
+        '4W': manufacturers[5:]
+    }
+    
+    # Base number varies by category and has some seasonality (one row per date)
+    base = (np.array([500000, 50000, 300000])[None, :] +
+            np.array([100000, 10000, 50000])[None, :] * (months[:, None] % 12) / 12)
+    
+    # Add some random variation
+    totals = (base * (0.8 + 0.4 * rng.random(base.shape))).astype(np.int64)
+    
+    # For each category, a column for the category total followed by one column per
+    # manufacturer, which gets a Dirichlet-distributed share of that total, along with
+    # the category / manufacturer codes of those columns (manufacturer 0 is 'All')
+    registration_blocks = []
+    category_codes = []
+    manufacturer_codes = []
+    for j, category in enumerate(categories):
+        relevant_manufacturers = category_manufacturers[category]
+        man_shares = rng.dirichlet(np.ones(len(relevant_manufacturers)), size=len(dates))
+        man_registrations = (totals[:, j, None] * man_shares).astype(np.int64)
+        
+        registration_blocks.append(np.column_stack([totals[:, j], man_registrations]))
+        category_codes += [j] * (1 + len(relevant_manufacturers))
+        manufacturer_codes += [0] + [manufacturers.index(m) + 1 for m in relevant_manufacturers]
+    
+    registrations = np.concatenate(registration_blocks, axis=1)
+    rows_per_date = registrations.shape[1]
+    
+    # Create DataFrame, one row per (date, category, manufacturer) in date order; the
+    # names are built as categoricals straight from the tiled codes, so they are
+    # dictionary-encoded without creating a string per row
+    df = pd.DataFrame({
+        'Date': np.repeat(dates.to_numpy(), rows_per_date),
+        'Category': pd.Categorical.from_codes(np.tile(category_codes, len(dates)), categories=categories),
+        'Manufacturer': pd.Categorical.from_codes(
+            np.tile(manufacturer_codes, len(dates)), categories=['All'] + manufacturers
+        ),
+        'Registrations': registrations.ravel()
+    })
     
     # Save the data
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    df.to_csv(f'data/vahan_sample_data_{timestamp}.csv', index=False)
-    print(f"Generated sample data: data/vahan_sample_data_{timestamp}.csv")
+    df.to_parquet(f'data/vahan_sample_data_{RUN_TS}.parquet', engine='pyarrow', compression='snappy', index=False)
+    print(f"Generated sample data: data/vahan_sample_data_{RUN_TS}.parquet")
     
     return df
 
@@ -235,9 +502,9 @@ if __name__ == "__main__":
     # If scraping fails, try API endpoints
     if not success:
         print("\nAttempting to get data from API endpoints...")
-        get_vahan_api_data()
+        asyncio.run(get_vahan_api_data())
     
     # If both methods fail, generate sample data for testing
-    if not success and not any(f.startswith('vahan_') for f in os.listdir('data')):
+    if not success and not any(Path('data').glob('vahan_*')):
         print("\nGenerating sample data for testing...")
         generate_sample_data()
\ No newline at end of file